@@ -1,12 +1,28 @@
+import time
+import hashlib
+import threading
 import firebase_admin
+from cachetools import TTLCache
 from firebase_admin import auth
 from firebase_admin._auth_utils import InvalidIdTokenError, ExpiredIdTokenError
 
+# Cache keyed by SHA-256(token); entries expire after 5 minutes or at the
+# token's "exp" claim, whichever comes first.
+_token_cache = TTLCache(maxsize=10_000, ttl=300)
+_token_cache_lock = threading.Lock()
+
 def verify_firebase_token(id_token: str):
+    key = hashlib.sha256(id_token.encode()).digest()
+    with _token_cache_lock:
+        cached = _token_cache.get(key)
+    if cached and cached.get("exp", 0) > time.time():
+        return cached
     try:
         decoded_token = auth.verify_id_token(id_token)
-        return decoded_token
     except (InvalidIdTokenError, ExpiredIdTokenError):
         return None
     except Exception:
-        return None
\ No newline at end of file
+        return None
+    with _token_cache_lock:
+        _token_cache[key] = decoded_token
+    return decoded_token
\ No newline at end of file
@@ -1,10 +1,12 @@
-from PyPDF2 import PdfReader
+import fitz  # PyMuPDF
 
 def extract_text_from_pdf(file_bytes):
-    reader = PdfReader(file_bytes)
-    text = ""
-    for page in reader.pages:
-        page_text = page.extract_text()
-        if page_text:
-            text += page_text
-    return text.strip()
\ No newline at end of file
+    data = file_bytes.read() if hasattr(file_bytes, "read") else file_bytes
+    with fitz.open(stream=data, filetype="pdf") as doc:
+        return "\n".join(page.get_text("text") for page in doc).strip()
+
+def extract_page_range(data, start, end):
+    # Kept in this fitz-only module so process-pool workers can import it
+    # without pulling in the backend's Firebase/Gemini setup.
+    with fitz.open(stream=data, filetype="pdf") as doc:
+        return "".join(doc[i].get_text("text") for i in range(start, end))
\ No newline at end of file
@@ -4,14 +4,29 @@
 
 import os
 import re
+import asyncio
+import time
+import hashlib
+import logging
 import datetime
+import threading
+import multiprocessing
 from typing import List
+from functools import lru_cache
+from itertools import repeat
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from fastapi import FastAPI, UploadFile, File, Form, Header, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from firebase_admin import credentials, initialize_app, firestore, auth
 import google.generativeai as genai
+from google.api_core.exceptions import GoogleAPIError
+from google.generativeai.types import BlockedPromptException, StopCandidateException
 import fitz  # PyMuPDF
-import tempfile
+from cachetools import TTLCache
+from firebase.pdf_utils import extract_page_range
+
+logger = logging.getLogger(__name__)
 
 # ============================================================
 # 1️⃣ LOCAL CONFIGURATION
@@ -29,23 +44,19 @@ db = firestore.client()
 # ============================================================
 # 3️⃣ GEMINI CONFIGURATION
 # ============================================================
-genai.configure(api_key=gemini_key)
-
-def get_gemini_model():
-    preferred_models = [
-        "gemini-2.5-pro",
-        "gemini-2.5-flash",
-        "gemini-2.0-pro-exp",
-        "gemini-2.0-flash"
-    ]
-    for model_name in preferred_models:
-        try:
-            return genai.GenerativeModel(model_name)
-        except Exception:
-            continue
-    raise RuntimeError("❌ No supported Gemini model found.")
+@lru_cache(maxsize=1)
+def get_gemini_model_name():
+    # Configured lazily and once per process; override with GEMINI_MODEL
+    genai.configure(api_key=gemini_key)
+    model_name = os.getenv("GEMINI_MODEL", "gemini-2.5-pro")
+    logger.info("Using Gemini model: %s", model_name)
+    return model_name
 
-model = get_gemini_model()
+# Static system prompts are set as the model's system instruction so each
+# request only sends the document-specific text after a stable prefix.
+@lru_cache(maxsize=None)
+def get_prompt_model(system_prompt: str):
+    return genai.GenerativeModel(get_gemini_model_name(), system_instruction=system_prompt)
 
 # ============================================================
 # 4️⃣ FASTAPI INITIALIZATION
@@ -63,20 +74,86 @@ app.add_middleware(
 # ============================================================
 # 5️⃣ FIREBASE AUTH
 # ============================================================
+# Verified tokens are cached by SHA-256 so repeat uploads skip the JWKS
+# lookup + signature check. Entries live at most 5 minutes and are never
+# served past the token's own "exp" claim.
+_token_cache = TTLCache(maxsize=10_000, ttl=300)
+_token_cache_lock = threading.Lock()
+
 def verify_firebase_token(id_token: str):
+    key = hashlib.sha256(id_token.encode()).digest()
+    with _token_cache_lock:
+        cached = _token_cache.get(key)
+    if cached and cached.get("exp", 0) > time.time():
+        return cached
     try:
-        return auth.verify_id_token(id_token)
+        decoded = auth.verify_id_token(id_token)
     except Exception:
         return None
+    with _token_cache_lock:
+        _token_cache[key] = decoded
+    return decoded
 
 # ============================================================
 # 6️⃣ PDF TEXT EXTRACTION
 # ============================================================
-def extract_text_from_pdf(pdf_path: str) -> str:
-    text = ""
-    with fitz.open(pdf_path) as pdf:
-        for page in pdf:
-            text += page.get_text()
+# Long documents are split into page ranges and extracted in worker
+# processes (MuPDF is not safe to drive from several threads at once).
+# Each chunk ships the whole PDF to a worker, so use one chunk per worker and
+# never fewer than MIN_PAGES_PER_CHUNK pages. Workers are spawned (not forked)
+# because this runs after gRPC/Firestore threads have started.
+MIN_PAGES_PER_CHUNK = 16
+PARALLEL_PAGE_THRESHOLD = 2 * MIN_PAGES_PER_CHUNK
+PDF_WORKERS = os.cpu_count() or 1
+# Uploads run extraction on several threads, so every fitz call made in this
+# process (page counting and the serial path) is serialized by this lock.
+_mupdf_lock = threading.Lock()
+
+def _new_pdf_pool():
+    return ProcessPoolExecutor(max_workers=PDF_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+
+_pdf_pool = _new_pdf_pool()
+_pdf_pool_lock = threading.Lock()
+
+def _replace_broken_pdf_pool(broken):
+    # A dead worker (MuPDF crash, OOM kill) breaks the whole executor;
+    # swap in a fresh one so later uploads can use the pool again
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is broken:
+            _pdf_pool = _new_pdf_pool()
+    broken.shutdown(wait=False, cancel_futures=True)
+
+@app.on_event("shutdown")
+def shutdown_pdf_pool():
+    _pdf_pool.shutdown(wait=False, cancel_futures=True)
+
+def _extract_pages_serial(data: bytes) -> list:
+    with _mupdf_lock:
+        with fitz.open(stream=data, filetype="pdf") as pdf:
+            return [page.get_text("text") for page in pdf]
+
+def extract_text_from_pdf(data: bytes) -> str:
+    parts = []
+    with _mupdf_lock:
+        with fitz.open(stream=data, filetype="pdf") as pdf:
+            page_count = pdf.page_count
+            use_pool = page_count >= PARALLEL_PAGE_THRESHOLD and PDF_WORKERS >= 2
+            if not use_pool:
+                for page in pdf:
+                    parts.append(page.get_text("text"))
+    if use_pool:
+        chunk = max(MIN_PAGES_PER_CHUNK, -(-page_count // PDF_WORKERS))
+        starts = range(0, page_count, chunk)
+        ends = [min(s + chunk, page_count) for s in starts]
+        pool = _pdf_pool
+        try:
+            parts = list(pool.map(extract_page_range, repeat(data), starts, ends))
+        except BrokenProcessPool:
+            logger.warning("PDF worker pool broke; rebuilding it and extracting serially", exc_info=True)
+            _replace_broken_pdf_pool(pool)
+            parts = _extract_pages_serial(data)
+    text = "".join(parts)
     if not text:
         raise HTTPException(status_code=400, detail="Could not extract text from the PDF.")
     return text.strip()
@@ -84,13 +161,7 @@ def extract_text_from_pdf(pdf_path: str) -> str:
 # ============================================================
 # 7️⃣ SUMMARIZE USING GEMINI (Structured + Deterministic)
 # ============================================================
-def summarize_with_gemini(text: str) -> dict:
-    """
-    Generate a clear, structured summary + metadata using Gemini,
-    formatted as JSON + Markdown for consistency.
-    """
-    try:
-        system_prompt = """
+SUMMARY_SYSTEM_PROMPT = """
         You are Eudia Legal Summarizer AI.
         Summarize the given legal document in a structured way.
         Extract these fields clearly:
@@ -126,51 +197,135 @@ def summarize_with_gemini(text: str) -> dict:
         Make sure JSON is valid and strictly follows this structure.
         """
 
-        response = model.generate_content(f"{system_prompt}\n\n---\n{text}")
+def summarize_with_gemini(text: str) -> dict:
+    """
+    Generate a clear, structured summary + metadata using Gemini,
+    formatted as JSON + Markdown for consistency.
+    """
+    try:
+        response = get_prompt_model(SUMMARY_SYSTEM_PROMPT).generate_content(text)
         summary_text = response.text or "Summary generation failed."
-        return {"structured_summary": summary_text}
-
-    except Exception as e:
+    except (GoogleAPIError, BlockedPromptException, StopCandidateException, ValueError) as e:
+        # API/transport errors, blocked prompts, and responses without text
         raise HTTPException(status_code=500, detail=f"Gemini summarization failed: {e}")
+    return {"structured_summary": summary_text}
+
+# ============================================================
+# PRECOMPILED PATTERNS (compiled once per process)
+# ============================================================
+# NBSP -> space, en/em/figure dashes -> hyphen (one pass via str.translate)
+_NORMALIZE_TABLE = str.maketrans({"\u00A0": " ", "–": "-", "—": "-", "‒": "-"})
+_WS_RE = re.compile(r"[ \t]+")
+_NL_RE = re.compile(r"\s*\n\s*")
+_SPACES_RE = re.compile(r"\s+")
+_ORDINAL_RE = re.compile(r"(\d+)(st|nd|rd|th)", re.IGNORECASE)
+
+_MONTHS = r'(?:Jan(?:uary)?|Feb(?:ruary)?|Mar(?:ch)?|Apr(?:il)?|May|Jun(?:e)?|Jul(?:y)?|Aug(?:ust)?|Sep(?:t(?:ember)?)?|Oct(?:ober)?|Nov(?:ember)?|Dec(?:ember)?)'
+
+# One pass over the text; the month name is matched once and shared by every
+# month-led form, so a failed range doesn't re-scan it for the other shapes.
+# Dispatch on m.lastgroup: range / full_md / my / full_dm / iso / num.
+_DATES_RE = re.compile(rf'''
+    \b(?P<mo>{_MONTHS})\s+(?:
+        # 1) Ranges like "February 5-12, 2026" or "Feb 5–12, 2026"
+        (?P<range>(?P<d1>\d{{1,2}})\s*[–-]\s*(?P<d2>\d{{1,2}}),\s*(?P<yr>\d{{4}}))
+        # 2) Full dates "November 15, 2025"
+      | (?P<full_md>\d{{1,2}},\s*\d{{4}})
+        # 3) Month Year "March 2026"
+      | (?P<my>\d{{4}})
+    )\b
+  | \b(?:
+        # 2) Full dates "15 November 2025"
+        (?P<full_dm>\d{{1,2}}\s+{_MONTHS}\s+\d{{4}})
+        # 4) ISO and numeric dates
+      | (?P<iso>\d{{4}}-\d{{2}}-\d{{2}})
+      | (?P<num>\d{{1,2}}[/.-]\d{{1,2}}[/.-]\d{{2,4}})
+    )\b
+''', re.IGNORECASE | re.VERBOSE)
+
+# A) Classic "Section ..." patterns (Indian style + generic)
+_ACTS_A = r'(?:IPC|CrPC|CPC|NI\s*Act|IT\s*Act|Evidence\s*Act|PMLA|NDPS|Arms\s*Act|PC\s*Act|POCSO|Companies\s*Act|Motor\s*Vehicles\s*Act|Contract\s*Act)'
+_SECTION_A_RE = re.compile(rf'''
+    (?:
+        (?:(?:u/s|u\/s)\s*|(?:under\s+)?(?:section|sec\.?)\s*)
+        (?P<num>[0-9A-Za-z()\-/]+)
+        (?:\s*(?:of\s+the\s+)?)\s*
+        (?P<act>{_ACTS_A})?
+    )
+''', re.IGNORECASE | re.VERBOSE)
+
+# B) Generic "[X] Code ###" and "[X] Act ###" patterns (e.g., Franklin Penal Code 312(b), Evidence Code 128, Digital Security Act 44)
+_SECTION_B_RE = re.compile(r'''
+    (?:
+        (?P<title>[A-Z][A-Za-z ]+(?:Code|Act))\s+
+        (?P<code_no>[0-9A-Za-z()-]+)
+    )
+''', re.IGNORECASE | re.VERBOSE)
+
+# Case status keywords (substring match, same as the old `in` checks)
+_STATUS_RE = re.compile(r"judgment|delivered|final order|issued|dismissed|acquitted|convicted|sentenced", re.IGNORECASE)
+
+_SECTION_SPLIT_RE = re.compile(r'[\/,]|(?:\s*-\s*)|(?:\s+and\s+)')
+_SECTION_NUM_RE = re.compile(r'^[0-9]+[A-Za-z()\-]*$')
+_CODE_NO_RE = re.compile(r'^[0-9A-Za-z()\-]+$')
 
 # ============================================================
 # TEXT NORMALIZATION
 # ============================================================
 def _normalize_text(text: str) -> str:
-    import re
     # Replace en/em dashes with hyphen, collapse whitespace, kill NBSP
-    clean = (
-        text.replace("\u00A0", " ")
-            .replace("–", "-")
-            .replace("—", "-")
-            .replace("‒", "-")
-    )
-    clean = re.sub(r"[ \t]+", " ", clean)
-    clean = re.sub(r"\s*\n\s*", "\n", clean)  # keep line breaks but trim them
+    clean = text.translate(_NORMALIZE_TABLE)
+    clean = _WS_RE.sub(" ", clean)
+    clean = _NL_RE.sub("\n", clean)  # keep line breaks but trim them
     return clean.strip()
 
 
 # ============================================================
 # DATE UTILITIES
 # ============================================================
+_MONTH_MAP = {
+    "jan": 1, "january": 1, "feb": 2, "february": 2, "mar": 3, "march": 3,
+    "apr": 4, "april": 4, "may": 5, "jun": 6, "june": 6,
+    "jul": 7, "july": 7, "aug": 8, "august": 8, "sep": 9, "september": 9,
+    "oct": 10, "october": 10, "nov": 11, "november": 11, "dec": 12, "december": 12,
+}
+
+# (pattern, candidates) in priority order; candidates turns a match into
+# (year, month, day) tuples to try, first valid one wins.
+_DATE_PARSERS = [
+    # 15 November 2025 / 15 Nov 2025
+    (re.compile(r"(\d{1,2})\s+([A-Za-z]+)\s+(\d{4})"),
+     lambda m: [(m[3], _MONTH_MAP.get(m[2].lower()), m[1])]),
+    # November 15 2025 / Nov 15 2025
+    (re.compile(r"([A-Za-z]+)\s+(\d{1,2})\s+(\d{4})"),
+     lambda m: [(m[3], _MONTH_MAP.get(m[1].lower()), m[2])]),
+    # March 2026 / Mar 2026
+    (re.compile(r"([A-Za-z]+)\s+(\d{4})"),
+     lambda m: [(m[2], _MONTH_MAP.get(m[1].lower()), 1)]),
+    # 2025-11-30
+    (re.compile(r"(\d{4})-(\d{1,2})-(\d{1,2})"),
+     lambda m: [(m[1], m[2], m[3])]),
+    # 30/11/2025, 11/30/2025, 30-11-2025, 30.11.2025 (day-first wins)
+    (re.compile(r"(\d{1,2})([-/.])(\d{1,2})\2(\d{4})"),
+     lambda m: [(m[4], m[3], m[1]), (m[4], m[1], m[3])]),
+]
+
+@lru_cache(maxsize=8192)
 def _parse_one_date(ds: str):
     """Parse a single date string (already cleaned, no ranges)."""
-    from datetime import datetime
+    from datetime import date
     ds = ds.replace(",", " ").strip()
-    fmts = [
-        "%d %B %Y", "%B %d %Y",        # 15 November 2025 / November 15 2025
-        "%d %b %Y",  "%b %d %Y",       # 15 Nov 2025 / Nov 15 2025
-        "%B %Y",     "%b %Y",          # March 2026 / Mar 2026
-        "%Y-%m-%d",                    # 2025-11-30
-        "%d/%m/%Y", "%m/%d/%Y",        # 30/11/2025, 11/30/2025
-        "%d-%m-%Y", "%m-%d-%Y",
-        "%d.%m.%Y", "%m.%d.%Y",
-    ]
-    for f in fmts:
-        try:
-            return datetime.strptime(ds, f).date()
-        except ValueError:
+    for pattern, candidates in _DATE_PARSERS:
+        m = pattern.fullmatch(ds)
+        if not m:
             continue
+        for y, mo, d in candidates(m):
+            if mo is None:
+                continue
+            try:
+                return date(int(y), int(mo), int(d))
+            except ValueError:
+                continue
     return None
 
 
@@ -191,11 +346,35 @@ def _expand_range(mo: str, d1: str, d2: str, year: str):
     return out
 
 
+def _find_dates(clean: str):
+    """
+    Scan normalized text once and return [(date, (start, end)), ...] in
+    document order, where (start, end) is the span of the matched text.
+    A range contributes both of its end dates with the same span.
+    """
+    found = []
+    for m in _DATES_RE.finditer(clean):
+        if m.lastgroup == "range":
+            for dt in _expand_range(m.group("mo"), m.group("d1"), m.group("d2"), m.group("yr")):
+                found.append((dt, m.span()))
+        else:
+            raw = m.group(0)
+            # Clean ordinal suffixes and commas
+            raw = _ORDINAL_RE.sub(r'\1', raw)
+            raw = raw.replace(",", " ")
+            dt = _parse_one_date(raw)
+            if dt:
+                found.append((dt, m.span()))
+    return found
+
+
 # ============================================================
 # EXTRACT + CLASSIFY ALL DATES (PAST / UPCOMING) + TOTAL COUNTS
 # ============================================================
-def extract_and_classify_dates(text: str):
+def extract_and_classify_dates(text: str, normalized: bool = False, found_dates: list = None):
     """
+    Pass normalized=True if text already went through _normalize_text, and
+    found_dates (a _find_dates result) to reuse an existing scan.
     Returns:
       {
         "all_unique_sorted": [date_str, ...],
@@ -205,53 +384,14 @@ def extract_and_classify_dates(text: str):
       }
     Where date_str is "DD Month YYYY".
     """
-    import re
     from datetime import datetime, date
 
-    clean = _normalize_text(text)
-
-    MONTHS = r'(?:Jan(?:uary)?|Feb(?:ruary)?|Mar(?:ch)?|Apr(?:il)?|May|Jun(?:e)?|Jul(?:y)?|Aug(?:ust)?|Sep(?:t(?:ember)?)?|Oct(?:ober)?|Nov(?:ember)?|Dec(?:ember)?)'
-
-    # 1) Ranges like "February 5-12, 2026" or "Feb 5–12, 2026"
-    rng = rf'\b({MONTHS})\s+(\d{{1,2}})\s*[–-]\s*(\d{{1,2}}),\s*(\d{{4}})\b'
-
-    # 2) Full dates "15 November 2025" or "November 15, 2025"
-    full1 = rf'\b\d{{1,2}}\s+{MONTHS}\s+\d{{4}}\b'
-    full2 = rf'\b{MONTHS}\s+\d{{1,2}},\s*\d{{4}}\b'
-
-    # 3) Month Year "March 2026"
-    my = rf'\b{MONTHS}\s+\d{{4}}\b'
-
-    # 4) ISO and numeric dates
-    iso = r'\b\d{4}-\d{2}-\d{2}\b'
-    num = r'\b\d{1,2}[\/.-]\d{1,2}[\/.-]\d{2,4}\b'
-
-    pattern = rf'({rng})|({full1})|({full2})|({my})|({iso})|({num})'
-
-    matches = list(re.finditer(pattern, clean, flags=re.IGNORECASE))
-
-    found_dates = []
-
-    for m in matches:
-        # If it matched the range form, groups 2..5 will be filled
-        if m.group(2) and m.group(3) and m.group(4) and m.group(5):
-            # month, d1, d2, year
-            mo = m.group(2)  # because of overall grouping shift with (rng) inside (...)
-            d1 = m.group(3)
-            d2 = m.group(4)
-            yr = m.group(5)
-            found_dates.extend(_expand_range(mo, d1, d2, yr))
-        else:
-            raw = m.group(0)
-            # Clean ordinal suffixes and commas
-            raw = re.sub(r'(\d+)(st|nd|rd|th)', r'\1', raw, flags=re.IGNORECASE)
-            raw = raw.replace(",", " ")
-            dt = _parse_one_date(raw)
-            if dt:
-                found_dates.append(dt)
+    if found_dates is None:
+        clean = text if normalized else _normalize_text(text)
+        found_dates = _find_dates(clean)
 
     # Unique + sorted
-    unique_sorted = sorted(set(found_dates))
+    unique_sorted = sorted({dt for dt, _ in found_dates})
     today = datetime.now().date()
 
     past = [d for d in unique_sorted if d < today]
@@ -272,131 +412,91 @@ def extract_and_classify_dates(text: str):
 # ============================================================
 # SECTION EXTRACTION (INDIA + GENERIC CODES + "Franklin Penal Code 312(b)" etc.)
 # ============================================================
-def extract_sections_invoked(text: str):
+def extract_sections_invoked(text: str, normalized: bool = False):
     """
     Detects both:
       - 'Section 420 IPC', 'u/s 138 NI Act', 'Sec. 65 IT Act'
       - 'Franklin Penal Code 312(b)', 'Evidence Code 128', 'Digital Security Act 44'
+    Pass normalized=True if text already went through _normalize_text.
     Returns (unique_list, count)
     """
-    import re
-    clean = _normalize_text(text)
-
-    # A) Classic "Section ..." patterns (Indian style + generic)
-    ACTS_A = r'(?:IPC|CrPC|CPC|NI\s*Act|IT\s*Act|Evidence\s*Act|PMLA|NDPS|Arms\s*Act|PC\s*Act|POCSO|Companies\s*Act|Motor\s*Vehicles\s*Act|Contract\s*Act)'
-    patt_a = rf'''
-        (?:
-            (?:(?:u/s|u\/s)\s*|(?:under\s+)?(?:section|sec\.?)\s*)
-            (?P<num>[0-9A-Za-z()\-/]+)
-            (?:\s*(?:of\s+the\s+)?)\s*
-            (?P<act>{ACTS_A})?
-        )
-    '''
-
-    # B) Generic "[X] Code ###" and "[X] Act ###" patterns (e.g., Franklin Penal Code 312(b), Evidence Code 128, Digital Security Act 44)
-    patt_b = r'''
-        (?:
-            (?P<title>[A-Z][A-Za-z ]+(?:Code|Act))\s+
-            (?P<code_no>[0-9A-Za-z()-]+)
-        )
-    '''
+    clean = text if normalized else _normalize_text(text)
 
     found = []
 
+    # A) and B) stay as two scans on purpose: their matches overlap, and a
+    # single alternation would let one consume the other's text (e.g. B's
+    # "Indian Penal Code section" hiding A's "section 302").
+
     # Collect A)
-    for m in re.finditer(patt_a, clean, flags=re.IGNORECASE | re.VERBOSE):
+    for m in _SECTION_A_RE.finditer(clean):
         nums = m.group('num') or ""
         act  = (m.group('act') or "").strip()
-        parts = re.split(r'[\/,]|(?:\s*-\s*)|(?:\s+and\s+)', nums)
+        parts = _SECTION_SPLIT_RE.split(nums)
         for p in parts:
             p = p.strip()
             if not p:
                 continue
-            if not re.match(r'^[0-9]+[A-Za-z()\-]*$', p):
+            if not _SECTION_NUM_RE.match(p):
                 continue
             label = f"Section {p}" + (f" {act}" if act else "")
             found.append(label)
 
     # Collect B)
-    for m in re.finditer(patt_b, clean, flags=re.IGNORECASE | re.VERBOSE):
+    for m in _SECTION_B_RE.finditer(clean):
         title = m.group('title').strip()
         code_no = m.group('code_no').strip()
         # Exclude if this is clearly not a legal ref (rare)
-        if re.match(r'^[0-9A-Za-z()\-]+$', code_no):
+        if _CODE_NO_RE.match(code_no):
             label = f"{title} {code_no}"
             found.append(label)
 
-    # Deduplicate case-insensitively
-    dedup, seen = [], set()
+    # Deduplicate case-insensitively (first-seen spelling wins, order kept)
+    seen = {}
     for s in found:
-        key = s.lower()
-        if key not in seen:
-            seen.add(key)
-            dedup.append(s)
+        seen.setdefault(s.lower(), s)
 
-    return dedup, len(dedup)
+    return list(seen.values()), len(seen)
 
 
 # ============================================================
 # TIMELINE (COMPLETE + CLEAN; INCLUDES RANGES & MONTH-YEAR)
 # ============================================================
-def generate_case_timeline(text: str) -> list:
+def generate_case_timeline(text: str, normalized: bool = False, found_dates: list = None) -> list:
     """
     Returns a list of dicts:
       [{ "date": "DD Month YYYY", "status": "✅ Completed|⏳ Upcoming", "event_context": "..." }, ...]
+    Pass normalized=True if text already went through _normalize_text, and
+    found_dates (a _find_dates result over that same text) to reuse a scan.
     """
-    import re
     from datetime import datetime
 
-    clean = _normalize_text(text)
+    clean = text if normalized else _normalize_text(text)
+    if found_dates is None:
+        found_dates = _find_dates(clean)
 
-    # Reuse the same extraction to ensure parity with counts
-    dates_info = extract_and_classify_dates(clean)
-    all_dates = dates_info["all_unique_sorted"]
+    # Same scan as extract_and_classify_dates (parity with counts), keeping
+    # where each date first occurs so its context comes from that spot.
+    first_span = {}
+    for dt, span in found_dates:
+        first_span.setdefault(dt, span)
 
-    # Build context for each date by locating it in text (fuzzy match)
     events = []
     now = datetime.now().date()
 
-    # Create a regex that matches any of the pretty dates in the clean text window
-    # We'll also try to recover context by scanning around the first occurrence of components.
-    for dstr in all_dates:
-        # Try to find "Month" and "Year" proximity for context window
-        # Fallback: direct search for year
-        try:
-            # Pull a small window around the year to show event text
-            year = re.search(r'\b(\d{4})\b', dstr).group(1)
-        except:
-            year = None
-
-        idx = -1
-        if year:
-            ymatch = re.search(rf'\b{year}\b', clean)
-            if ymatch:
-                idx = ymatch.start()
-
-        # Context window
-        start = max(0, idx - 120) if idx >= 0 else 0
-        end   = min(len(clean), (idx + 160) if idx >= 0 else 200)
-        context = re.sub(r'\s+', ' ', clean[start:end]).strip()
-
-        # Status
-        from datetime import datetime as _dt
-        parsed = _parse_one_date(dstr)  # convert "DD Month YYYY" -> date
-        status = "⏳ Upcoming" if (parsed and parsed >= now) else "✅ Completed"
+    # Sorted chronologically
+    for dt in sorted(first_span):
+        start, end = first_span[dt]
+        context = _SPACES_RE.sub(' ', clean[max(0, start - 120):min(len(clean), end + 160)]).strip()
+        status = "⏳ Upcoming" if dt >= now else "✅ Completed"
 
         events.append({
-            "date": dstr,
+            "date": dt.strftime("%d %B %Y"),
             "event_context": context,
             "status": status
         })
 
-    # Sort chronologically
-    def _to_date(s): 
-        return _parse_one_date(s) or datetime(1970,1,1).date()
-
-    events.sort(key=lambda e: _to_date(e["date"]))
-    return events 
+    return events
 
 # ============================================================
 # ⚖️ DETECT CASE STATUS
@@ -406,10 +506,10 @@ def detect_case_status(summary_text: str, metadata: dict) -> str:
     Detect if the case is ongoing or closed based on summary and metadata.
     Returns 'Ongoing' or 'Closed'.
     """
-    text = summary_text.lower()
+    hits = {m.group(0).lower() for m in _STATUS_RE.finditer(summary_text)}
     if (
-        "judgment" in text and "delivered" in text
-    ) or ("final order" in text and "issued" in text):
+        "judgment" in hits and "delivered" in hits
+    ) or ("final order" in hits and "issued" in hits):
         return "Closed"
 
     # If there are upcoming dates, it’s ongoing
@@ -417,8 +517,8 @@ def detect_case_status(summary_text: str, metadata: dict) -> str:
         return "Ongoing"
 
     # If explicitly says 'case dismissed', 'acquitted', 'convicted'
-    keywords_closed = ["dismissed", "acquitted", "convicted", "sentenced"]
-    if any(k in text for k in keywords_closed):
+    keywords_closed = {"dismissed", "acquitted", "convicted", "sentenced"}
+    if hits & keywords_closed:
         return "Closed"
 
     return "Ongoing"
@@ -427,6 +527,12 @@ def detect_case_status(summary_text: str, metadata: dict) -> str:
 # ============================================================
 # ⚖️ GENERATE CASE TIPS (For Ongoing Cases)
 # ============================================================
+TIPS_SYSTEM_PROMPT = """
+        You are a legal strategy advisor for ongoing court cases.
+        Based on the following case summary and metadata,
+        suggest 3-5 professional and practical tips to prepare or strengthen the case.
+        """
+
 def generate_case_tips(summary_text: str, metadata: dict) -> list:
     """
     Use Gemini to generate context-aware tips if the case is ongoing.
@@ -438,10 +544,6 @@ def generate_case_tips(summary_text: str, metadata: dict) -> list:
             stage_info = f"The next upcoming date in the case is {next_hearing}."
 
         prompt = f"""
-        You are a legal strategy advisor for ongoing court cases.
-        Based on the following case summary and metadata,
-        suggest 3-5 professional and practical tips to prepare or strengthen the case.
-
         {stage_info}
 
         Case Summary:
@@ -450,7 +552,7 @@ def generate_case_tips(summary_text: str, metadata: dict) -> list:
         Tips should be specific, clear, and actionable (e.g., review evidence chain, witness prep, digital proof preservation, compliance reminders).
         """
 
-        response = model.generate_content(prompt)
+        response = get_prompt_model(TIPS_SYSTEM_PROMPT).generate_content(prompt)
         tips_text = response.text.strip() if response.text else "No tips generated."
 
         # Split into a clean list
@@ -468,10 +570,13 @@ def generate_structured_summary(text: str):
     summary_data = summarize_with_gemini(text)
     structured_text = summary_data["structured_summary"]
 
-    # Extract metadata (dates, sections, timeline)
-    dates_info = extract_and_classify_dates(text)
-    sections, section_count = extract_sections_invoked(text)
-    timeline = generate_case_timeline(text)
+    # Extract metadata (dates, sections, timeline) from one normalized copy,
+    # sharing a single date scan between the counts and the timeline
+    clean = _normalize_text(text)
+    found_dates = _find_dates(clean)
+    dates_info = extract_and_classify_dates(clean, found_dates=found_dates)
+    sections, section_count = extract_sections_invoked(clean, normalized=True)
+    timeline = generate_case_timeline(clean, normalized=True, found_dates=found_dates)
 
     metadata = {
         "dates": dates_info,
@@ -497,6 +602,39 @@ def generate_structured_summary(text: str):
 # ============================================================
 # 1️⃣1️⃣ UPLOAD + SUMMARIZE + STORE
 # ============================================================
+# Files are processed concurrently; the limiter is shared by every request
+# so in-flight Gemini work stays within rate limits process-wide.
+UPLOAD_CONCURRENCY = 4
+_upload_semaphore = asyncio.Semaphore(UPLOAD_CONCURRENCY)
+FIRESTORE_BATCH_LIMIT = 500  # max writes per Firestore batch
+
+def save_summaries(docs: list):
+    """
+    Store summary documents with one batched commit per 500 writes.
+    If a batch commit fails, its documents are retried individually so a
+    single bad document doesn't block the rest.
+    Returns the documents that could not be written.
+    """
+    failed = []
+    for i in range(0, len(docs), FIRESTORE_BATCH_LIMIT):
+        batch = db.batch()
+        pending = []
+        for doc in docs[i:i + FIRESTORE_BATCH_LIMIT]:
+            doc_ref = db.collection("summaries").document()
+            batch.set(doc_ref, doc)
+            pending.append((doc_ref, doc))
+        try:
+            batch.commit()
+        except Exception:
+            logger.warning("Firestore batch commit failed; retrying %d documents individually", len(pending), exc_info=True)
+            for doc_ref, doc in pending:
+                try:
+                    doc_ref.set(doc)
+                except Exception:
+                    logger.exception("Failed to store summary for %s", doc.get("filename"))
+                    failed.append(doc)
+    return failed
+
 @app.post("/upload/")
 async def upload_and_summarize(
     files: List[UploadFile] = File(...),
@@ -510,35 +648,43 @@ async def upload_and_summarize(
     if not user:
         raise HTTPException(status_code=403, detail="Invalid or expired Firebase token")
     user_id = user["uid"]
-    summaries = []
-    for file in files:
-        temp_path = None
-        try:
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp:
-                temp.write(await file.read())
-                temp_path = temp.name
-            text = extract_text_from_pdf(temp_path)
+
+    async def process_one(file: UploadFile):
+        async with _upload_semaphore:
+            data = await file.read()
+            # PDF parsing and the (blocking) Gemini calls run off the event loop
+            text = await asyncio.to_thread(extract_text_from_pdf, data)
             if not text:
-                continue
-            structured_output = generate_structured_summary(text)
-            db.collection("summaries").document().set({
-                "user_id": user_id,
-                "filename": file.filename,
-                "client_name": client_name,
-                "file_type": file_type,
-                "summary": structured_output["summary_markdown"],
-                "case_status": structured_output["case_status"],
-                "recommendations": structured_output["recommendations"],
-                "metadata": structured_output["metadata"],
-                "timestamp": firestore.SERVER_TIMESTAMP
-            })
-            summaries.append({
+                return None
+            structured_output = await asyncio.to_thread(generate_structured_summary, text)
+            return {
                 "filename": file.filename,
                 **structured_output
-            })
-        finally:
-            if temp_path and os.path.exists(temp_path):
-                os.remove(temp_path)
+            }
+
+    # Let every file finish (a failing file must not orphan its siblings'
+    # Gemini calls), then surface the first failure
+    results = await asyncio.gather(*(process_one(file) for file in files), return_exceptions=True)
+    errors = [r for r in results if isinstance(r, BaseException)]
+    summaries = [r for r in results if r and not isinstance(r, BaseException)]
+
+    failed = await asyncio.to_thread(save_summaries, [{
+        "user_id": user_id,
+        "filename": s["filename"],
+        "client_name": client_name,
+        "file_type": file_type,
+        "summary": s["summary_markdown"],
+        "case_status": s["case_status"],
+        "recommendations": s["recommendations"],
+        "metadata": s["metadata"],
+        "timestamp": firestore.SERVER_TIMESTAMP
+    } for s in summaries])
+    # Finished summaries are stored above even when a sibling file failed
+    if failed:
+        names = ", ".join(str(doc["filename"]) for doc in failed)
+        raise HTTPException(status_code=500, detail=f"Failed to store summaries for: {names}")
+    if errors:
+        raise errors[0]
     return {"summaries": summaries}
 
 # ============================================================